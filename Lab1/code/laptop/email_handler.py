@@ -1,15 +1,52 @@
 import smtplib
 import ssl
 import os
+import time
+from email.message import EmailMessage
 
 class EmailHandler:
     def __init__(self):
         self.smtp_server = "smtp.gmail.com"
         self.port = 465
+        # Seconds any SMTP socket operation may block; without it a half-open idle session
+        # (after sleep or a network change) hangs NOOP/send until the kernel gives up
+        self.timeout = 15
+        # Sessions idle longer than this are likely dropped server-side; reconnect without a NOOP
+        self.max_idle = 300
+        # Loading the CA bundle hits the disk, so build the TLS context once
+        self._context = ssl.create_default_context()
+        # Authenticated SMTP session kept open between alerts, and the credentials it used
+        self._server = None
+        self._login = None
+        self._last_used = 0.0
+
+    def _connect_and_login(self, sender_email, sender_password):
+        self.close()
+        server = smtplib.SMTP_SSL(self.smtp_server, self.port, context=self._context,
+                                  timeout=self.timeout)
+        try:
+            server.login(sender_email, sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._login = (sender_email, sender_password)
+
+    def _ping_failed(self):
+        if time.monotonic() - self._last_used > self.max_idle:
+            return True
+        try:
+            return self._server.noop()[0] != 250
+        except (smtplib.SMTPException, OSError):
+            return True
 
     def send_email(self, sender_email, sender_password, receiver_email, subject, body):
         """Sends an email using Gmail's SMTP server.
 
+        The SMTP session is reused across calls and only re-established when the
+        credentials change, it has sat idle past max_idle, or the server no longer
+        answers a NOOP.
+
         Args:
             sender_email (str): The sender's Gmail address.
             sender_password (str): The sender's Gmail app password.
@@ -20,19 +57,39 @@ class EmailHandler:
         Returns:
             bool: True if the email was sent successfully, False otherwise.
         """
-        message = f"Subject: {subject}\n\n{body}"
-
-        context = ssl.create_default_context()
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = sender_email
+        message["To"] = receiver_email
+        message.set_content(body)
 
         try:
-            with smtplib.SMTP_SSL(self.smtp_server, self.port, context=context) as server:
-                server.login(sender_email, sender_password)
-                server.sendmail(sender_email, receiver_email, message.encode('utf-8'))
-            print(f"Email sent successfully to {receiver_email}")
+            if self._server is None or self._login != (sender_email, sender_password) or self._ping_failed():
+                self._connect_and_login(sender_email, sender_password)
+            try:
+                self._server.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Connection dropped after the NOOP; reconnect once and retry. SMTPException is
+                # an OSError too, so protocol rejections must not be caught here.
+                self._connect_and_login(sender_email, sender_password)
+                self._server.send_message(message)
+            self._last_used = time.monotonic()
             return True
         except smtplib.SMTPAuthenticationError:
+            self.close()
             print("SMTP Authentication Error: Check your email/password or app password.")
             return False
         except Exception as e:
+            self.close()
             print(f"Failed to send email: {e}")
             return False
+
+    def close(self):
+        """Closes the cached SMTP session, if any."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._server = None
+        self._login = None
@@ -8,13 +8,16 @@ Usage:
 Requires: matplotlib, zezoconf (opnional, opt,.lfcar .amesocal names)
 """
 import argparse
+import bisect
 from email_handler import EmailHandler
 import json
 import queue
+import re
 import threading
 import time
 from collections import defaultdict, deque
-import math # Import math module for isnan
+
+import numpy as np
 
 import tkinter as tk
 from tkinter import ttk
@@ -26,9 +29,53 @@ from matplotlib.figure import Figure
 import socket
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except Exception:
     requests = None
 
+# JSON: use orjson when installed (parses bytes directly), otherwise the stdlib
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps_pretty(obj):
+        return json.dumps(obj, indent=4).encode("utf-8")
+
+
+_HTTP_ERROR_MSG = "HTTP error: %s. Retrying..."
+
+
+# "c1"/"c2" followed by a JSON number or null, as emitted in the flat /temp object
+_TEMP_FIELD_RE = re.compile(rb'"c([12])"\s*:\s*(null|-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)\s*[,}]')
+
+
+def _fast_parse_temps(body):
+    """Pulls c1/c2 out of a flat /temp JSON body without a general JSON parse.
+
+    Returns (c1, c2), with None for null or missing keys, or None when the body
+    does not have the expected shape so the caller can fall back to _json_loads.
+    """
+    if not (body.startswith(b"{") and body.rstrip().endswith(b"}")):
+        return None
+    found = {}
+    for m in _TEMP_FIELD_RE.finditer(body):
+        raw = m.group(2)
+        found[m.group(1)] = None if raw == b"null" else float(raw)
+    for key in (b"1", b"2"):
+        if key not in found and b'"c' + key + b'"' in body:
+            # Key is there but its value is not a plain number/null
+            return None
+    return found.get(b"1"), found.get(b"2")
+
 
 def resolve_mdns(host):
     # Try OS resolution first (supports .local on most systems)
@@ -41,73 +88,243 @@ def resolve_mdns(host):
     return host
 
 
+class _RingArray:
+    """Fixed-size ring of (timestamp, °C) samples stored as two NumPy arrays."""
+
+    __slots__ = ("ts", "t_c", "idx", "cap")
+
+    def __init__(self, capacity):
+        self.cap = capacity
+        self.ts = np.empty(capacity, dtype=np.float64)
+        self.t_c = np.empty(capacity, dtype=np.float64)
+        self.idx = 0
+
+    def append(self, t, temp_c):
+        i = self.idx % self.cap
+        self.ts[i] = t
+        self.t_c[i] = temp_c
+        self.idx += 1
+
+    def window(self, tmin):
+        """Returns (ts, t_c) of samples with ts >= tmin in chronological order.
+
+        Timestamps are appended in time order, so each segment is searched with
+        a binary search; a copy is only made when the window spans the wrap point.
+        """
+        if self.idx <= self.cap:
+            start = np.searchsorted(self.ts[:self.idx], tmin)
+            return self.ts[start:self.idx], self.t_c[start:self.idx]
+        i = self.idx % self.cap
+        start = i + np.searchsorted(self.ts[i:], tmin)
+        if start == self.cap:
+            # Window lies entirely in the newer segment
+            start = np.searchsorted(self.ts[:i], tmin)
+            return self.ts[start:i], self.t_c[start:i]
+        return (np.concatenate((self.ts[start:], self.ts[:i])),
+                np.concatenate((self.t_c[start:], self.t_c[:i])))
+
+    def last(self, n):
+        """Returns (ts, t_c) of the newest n samples (fewer if not yet filled), oldest first."""
+        n = min(n, self.idx, self.cap)
+        end = self.idx % self.cap
+        if n <= end:
+            return self.ts[end - n:end], self.t_c[end - n:end]
+        return (np.concatenate((self.ts[end - n:], self.ts[:end])),
+                np.concatenate((self.t_c[end - n:], self.t_c[:end])))
+
+
+def _c_to_f(t_c):
+    """°C -> °F for a scalar or array in one vectorized pass; NaN gaps pass through."""
+    t_f = np.multiply(t_c, 1.8)
+    t_f += 32.0
+    return t_f
+
+
+def _identity(t_c):
+    return t_c
+
+
+def _run_starts(ts, mask, carried_start=None):
+    """Start time of the run of True values each position belongs to (NaN where mask is False).
+
+    A run already open at position 0 began at carried_start, when given.
+    """
+    r = np.arange(len(mask))
+    first = np.maximum.accumulate(np.where(mask, -1, r)) + 1
+    starts = ts[np.minimum(first, len(ts) - 1)]
+    if carried_start is not None:
+        starts[first == 0] = carried_start
+    starts[~mask] = np.nan
+    return starts
+
+
 class HTTPPollerThread(threading.Thread):
-    def __init__(self, host, port, path, data_q, status_q, trigger_alert_callback,
-                 max_temp_threshold=None, min_temp_threshold=None, interval=0.5, timeout=5.0):
+    def __init__(self, host, port, path, data_q, status_q, interval=0.5, timeout=5.0, wakeup=None):
         super().__init__(daemon=True)
         self.host = host
         self.port = port
         self.path = path
         self.data_q = data_q
         self.status_q = status_q
-        self.trigger_alert_callback = trigger_alert_callback
-        self.max_temp_threshold = max_temp_threshold
-        self.min_temp_threshold = min_temp_threshold
         self.interval = interval
         self.timeout = timeout
-        self._stop = threading.Event()
+        # Optional callback taking a virtual event name ("<<Data>>"/"<<Status>>"), called after each enqueue
+        self.wakeup = wakeup
+        # Not named _stop: that would shadow threading.Thread._stop and break join()/is_alive()
+        self._stop_event = threading.Event()
+        self._etag = None
+        # The payload is a few dozen bytes of JSON: compression only adds framing and a zlib state
+        self._headers = {"Accept-Encoding": "identity", "Connection": "keep-alive", "Accept": "application/json"}
+        # Resolved device address, refreshed every resolve_ttl seconds or after repeated failures
+        self.resolve_ttl = 60.0
+        self._resolved_ip = None
+        self._resolve_expiry = 0.0
+
+        # One pooled session so every poll reuses the same keep-alive socket
+        self.session = None
+        if requests is not None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1,
+                                  max_retries=Retry(total=2, backoff_factor=0.2))
+            self.session.mount("http://", adapter)
 
     def stop(self):
-        self._stop.set()
+        self._stop_event.set()
+        if self.session is not None:
+            self.session.close()
+
+    def _wake(self, event):
+        if self.wakeup is not None:
+            self.wakeup(event)
 
     def notify(self, msg):
-        try:
-            self.status_q.put(msg, block=False)
-        except queue.Full:
-            pass
+        self.status_q.append(msg)
+        self._wake("<<Status>>")
 
     def run(self):
         if requests is None:
             self.notify("requests package not available. Install with: pip install requests")
             return
-        base_host = resolve_mdns(self.host)
-        url = f"http://{base_host}:{self.port}{self.path}"
-        self.notify(f"Polling {url}")
+        # Ask the device to hold the request until a new sample is ready (long poll).
+        # Firmware that ignores ?wait= simply answers right away.
+        wait_ms = int(self.interval * 2000)
+        timeout = max(self.timeout, self.interval * 4)
+        base_url = url = None
         last_ok = False
-        while not self._stop.is_set():
+        failures = 0
+        last_error_notify = float("-inf")
+        # Last decoded (c1, c2); a 304 re-emits it with a fresh timestamp
+        last_temps = None
+        # Hot attributes bound once as locals for the polling loop
+        session_get = self.session.get
+        data_append = self.data_q.append
+        stop_is_set = self._stop_event.is_set
+        stop_wait = self._stop_event.wait
+        monotonic = time.monotonic
+        while not stop_is_set():
+            if monotonic() >= self._resolve_expiry:
+                # Cached address expired or the device stopped answering: look it up again
+                # (a DHCP renewal or reboot may have moved it)
+                self._resolved_ip = resolve_mdns(self.host)
+                self._resolve_expiry = monotonic() + self.resolve_ttl
+                base_url = f"http://{self._resolved_ip}:{self.port}"
+                if url != f"{base_url}{self.path}?wait={wait_ms}":
+                    url = f"{base_url}{self.path}?wait={wait_ms}"
+                    self.notify(f"Polling {url}")
+            started = monotonic()
             try:
-                resp = requests.get(url, timeout=self.timeout)
+                headers = self._headers
+                if self._etag:
+                    headers = {**headers, "If-None-Match": self._etag}
+                resp = session_get(url, timeout=timeout, headers=headers)
                 resp.raise_for_status()
-                obj = resp.json()
-                # Expect: c1, c2, en1, en2, shown, ip
-                now = time.time()
-                # Push each sensor as its own sample if present
-                if obj.get("c1") is not None:
-                    self.data_q.put({"ts": now, "sensor": "S1", "t_c": float(obj["c1"])})
-                    self._check_alert("S1", float(obj["c1"]))
-                if obj.get("c2") is not None:
-                    self.data_q.put({"ts": now, "sensor": "S2", "t_c": float(obj["c2"])})
-                    self._check_alert("S2", float(obj["c2"]))
+                if resp.status_code in (204, 304):
+                    # Reading unchanged: skip decoding, but report it as still current so the
+                    # table's time, the plot and the alert timers keep advancing while it holds
+                    temps = last_temps
+                else:
+                    self._etag = resp.headers.get("ETag")
+                    body = resp.content
+                    temps = _fast_parse_temps(body)
+                    if temps is None:
+                        # Expect: c1, c2, en1, en2, shown, ip
+                        get = _json_loads(body).get
+                        temps = (get("c1"), get("c2"))
+                    last_temps = temps
+                if temps is not None:
+                    now = time.time()
+                    # Batch this response's samples as (ts, sensor, t_c) tuples in a single put
+                    c1, c2 = temps
+                    samples = []
+                    if c1 is not None:
+                        samples.append((now, "S1", float(c1)))
+                    if c2 is not None:
+                        samples.append((now, "S2", float(c2)))
+                    if samples:
+                        data_append(samples)
+                        self._wake("<<Data>>")
+                failures = 0
                 if not last_ok:
                     self.notify(f"Connected (HTTP {resp.status_code})")
                     last_ok = True
             except Exception as e:
                 if last_ok:
                     # mark a disconnect to draw plot gap
-                    try:
-                        self.status_q.put({"type": "disconnected", "timestamp": time.time()})
-                    except queue.Full:
-                        pass
-                self.notify(f"HTTP error: {e}. Retrying...")
+                    self.status_q.append({"type": "disconnected", "timestamp": time.time()})
+                    self._wake("<<Status>>")
+                # Only the latest status is ever shown, so format at most one error per second
+                if started - last_error_notify >= 1.0:
+                    last_error_notify = started
+                    self.notify(_HTTP_ERROR_MSG % e)
                 last_ok = False
-            finally:
-                time.sleep(self.interval)
+                self._etag = None
+                last_temps = None
+                failures += 1
+                if failures >= 2:
+                    self._resolve_expiry = 0.0
+                stop_wait(min(self.interval, 2.0))
+                continue
+            # A long-polled response already waited; only pace devices that answer immediately
+            remaining = self.interval - (monotonic() - started)
+            if remaining > 0:
+                stop_wait(remaining)
+
+
+class AlertSenderThread(threading.Thread):
+    """Sends queued alert emails off the UI thread over one persistent SMTP session."""
+
+    def __init__(self, alert_q, status_q, wakeup=None):
+        super().__init__(daemon=True)
+        self.alert_q = alert_q
+        self.status_q = status_q
+        self.wakeup = wakeup
+        self.email_handler = EmailHandler()
+
+    def stop(self):
+        try:
+            self.alert_q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def notify(self, msg):
+        self.status_q.append(msg)
+        if self.wakeup is not None:
+            self.wakeup("<<Status>>")
 
-    def _check_alert(self, sensor_id, temp_c):
-        if self.max_temp_threshold is not None and temp_c > self.max_temp_threshold:
-            self.trigger_alert_callback(sensor_id, temp_c, "above max threshold")
-        if self.min_temp_threshold is not None and temp_c < self.min_temp_threshold:
-            self.trigger_alert_callback(sensor_id, temp_c, "below min threshold")
+    def run(self):
+        while True:
+            alert = self.alert_q.get()
+            if alert is None:
+                break
+            sender_email, sender_password, recipient, subject, body = alert
+            try:
+                if self.email_handler.send_email(sender_email, sender_password, recipient, subject, body):
+                    self.notify(f"Alert email sent to {recipient}.")
+                else:
+                    self.notify(f"Failed to send alert email to {recipient}.")
+            except Exception as e:
+                self.notify(f"Error during alert email sending: {e}")
+        self.email_handler.close()
 
 
 class TempMonitorClientApp:
@@ -123,13 +340,17 @@ class TempMonitorClientApp:
         self.temp_unit = 'C'
         self.plot_limits = {'C': (10, 50), 'F': (50, 122)}
 
-        # Queues
-        self.data_queue = queue.Queue()
-        self.status_queue = queue.Queue()
+        # Queues (single producer/consumer; deque append/popleft are atomic, no locking needed).
+        # Only the newest status is displayed, so a bounded status deque just drops stale ones.
+        self.data_queue = deque()
+        self.status_queue = deque(maxlen=256)
 
         # Data model
-        self.series = defaultdict(lambda: deque(maxlen=history_seconds * 4))
+        self.series_capacity = history_seconds * 4
+        self.series = {s: _RingArray(self.series_capacity) for s in ("S1", "S2")}
         self.latest = {}
+        # Sorted sensor names, kept in step with self.series so frames never re-sort
+        self._sensor_order = sorted(self.series)
 
         # Sensor states (initially off, as per requirement 4.c) - Not directly used in HTTP polling, but kept for consistency if needed for commands
         self.sensor_states = {'S1': 'off', 'S2': 'off'}
@@ -140,7 +361,34 @@ class TempMonitorClientApp:
         self.recipient = None
         self.sender_email = None
         self.sender_password = None
-        self.last_alert_time = 0
+        # Queues are drained on <<Data>>/<<Status>> events posted by the worker threads;
+        # this timer only covers dropped events
+        self.drain_fallback_ms = 1000
+        self._closing = False
+        # Emails are sent by a background thread so SMTP never blocks the UI
+        self._alert_queue = queue.Queue(maxsize=64)
+        self.alert_sender = AlertSenderThread(self._alert_queue, self.status_queue, wakeup=self._post_event)
+        self.alert_sender.start()
+
+        # Alerts fire once readings have stayed past a threshold for persist_seconds, and
+        # re-arm once they have stayed back inside it by more than hysteresis_band as long.
+        # Time-based, because the sample rate depends on how often the reading changes.
+        self.hysteresis_band = 1.0
+        self.persist_seconds = 2.0
+        self._alert_active = defaultdict(bool)    # (sensor, "max"/"min") -> alert active
+        self._run_start = {}                      # (sensor, "max"/"min") -> start of the open run
+        self._alert_checked = defaultdict(int)    # sensor -> ring write index at last check
+
+        # Plot redraws are coalesced and capped at one frame per min_frame_interval (see _schedule_redraw)
+        self._redraw_pending = False
+        self.min_frame_interval = 0.1
+        self._last_redraw = 0.0
+        # Readings table is throttled independently of the plot (see _drain_data)
+        self._tree_dirty = set()
+        self._last_tree_draw = 0.0
+        # Sensors polled together share a timestamp (see _fmt_time)
+        self._last_strftime_t = -1
+        self._last_strftime_s = ""
 
         # Build UI
         self._build_widgets()
@@ -152,7 +400,9 @@ class TempMonitorClientApp:
         self.poller = None
         self._start_poller_thread()
 
-        # Poll queues
+        # Worker threads wake the UI with virtual events; a slow timer drains anything missed
+        self.root.bind("<<Data>>", self._drain_data)
+        self.root.bind("<<Status>>", self._drain_status)
         self.root.after(100, self._drain_status)
         self.root.after(int(self.interval * 1000), self._drain_data)
 
@@ -161,12 +411,19 @@ class TempMonitorClientApp:
             self.poller.stop()
         self.poller = HTTPPollerThread(self.host, self.port, "/temp",
                                        self.data_queue, self.status_queue,
-                                       trigger_alert_callback=self._trigger_alert_from_reader,
-                                       max_temp_threshold=self.max_temp_threshold,
-                                       min_temp_threshold=self.min_temp_threshold,
-                                       interval=self.interval)
+                                       interval=self.interval, wakeup=self._post_event)
         self.poller.start()
 
+    def _post_event(self, sequence):
+        """Queues a virtual event on the Tk main loop; safe to call from worker threads."""
+        if self._closing:
+            return
+        try:
+            self.root.event_generate(sequence, when="tail")
+        except (tk.TclError, RuntimeError):
+            # Window already destroyed, or Tcl built without threads: the drain timers still run
+            pass
+
     def _build_widgets(self):
         main = ttk.Frame(self.root, padding=10)
         main.pack(fill="both", expand=True)
@@ -185,6 +442,7 @@ class TempMonitorClientApp:
             self.tree.heading(c, text=c.capitalize() if c != "temp" else "Temp (°C)")
             self.tree.column(c, width=w, anchor="center")
         self.tree.pack(fill="x", padx=5, pady=5)
+        self.tree_row_ids = {s: self.tree.insert("", "end", values=(s, "N/A", "")) for s in ("S1", "S2")}
 
         bottom = ttk.LabelFrame(main, text="Live Plot")
         bottom.pack(fill="both", expand=True)
@@ -242,20 +500,26 @@ class TempMonitorClientApp:
         self.fig = Figure(figsize=(7, 4), dpi=100)
         self.ax = self.fig.add_subplot(111)
         self.ax.set_xlabel("Time (s, recent)")
-        self.ax.set_ylabel("Temperature (°C)")
         self.ax.grid(True, which="both", linestyle="--", alpha=0.4)
         self.ax.set_xlim(-self.history_seconds, 0)
+        self._apply_unit_axes()
+        # One persistent, animated Line2D per sensor; they are blitted over a cached background
+        self.lines = {s: self.ax.plot([], [], label=s, animated=True)[0] for s in ("S1", "S2")}
+        self.ax.legend(loc="upper left")
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=bottom)
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        # Re-capture the background after every full draw (first show, resize, unit change)
+        self._bg = None
+        self.canvas.mpl_connect("draw_event", self._on_canvas_draw)
 
         self.status_var = tk.StringVar(value="Ready")
         ttk.Label(main, textvariable=self.status_var, anchor="w").pack(fill="x", pady=(8, 0))
 
     def _load_settings(self):
         try:
-            with open("config.json", "r") as f:
-                settings = json.load(f)
+            with open("config.json", "rb") as f:
+                settings = _json_loads(f.read())
                 self.max_temp_threshold = settings.get("max_temp_threshold")
                 self.min_temp_threshold = settings.get("min_temp_threshold")
                 self.recipient = settings.get("recipient_email")
@@ -300,35 +564,65 @@ class TempMonitorClientApp:
             "sender_password": self.sender_password
         }
         try:
-            with open("config.json", "w") as f:
-                json.dump(settings, f, indent=4)
+            with open("config.json", "wb") as f:
+                f.write(_json_dumps_pretty(settings))
             self.notify("Settings saved to config.json.")
         except Exception as e:
             self.notify(f"Error saving settings: {e}")
 
     def _on_quit(self):
+        # Stop posting events before the main loop blocks in join()
+        self._closing = True
         try:
             self.poller.stop()
+            self.poller.join(timeout=1.0)
         except Exception:
             pass
+        self.alert_sender.stop()
+        self.alert_sender.join(timeout=1.0)
         self.root.destroy()
 
     def _toggle_unit(self):
         self.temp_unit = 'F' if self.temp_unit == 'C' else 'C'
         self.unit_button.config(text=f"Switch from {self.temp_unit}")
+        self.tree.heading("temp", text="Temp (°F)" if self.temp_unit == 'F' else "Temp (°C)")
+        self._apply_unit_axes()
         self._update_treeview_display()
-        self._redraw_plot()
+        self._update_lines()
+        self.canvas.draw()
 
-    def _update_treeview_display(self):
-        self.tree.delete(*self.tree.get_children())
-        for sensor, (t, temp_c) in sorted(self.latest.items()):
-            timestr = time.strftime("%H:%M:%S", time.localtime(t))
-            if temp_c is None or math.isnan(temp_c):
-                temp_display = "N/A"
+    def _format_temp(self, temp_c):
+        """Formats a °C reading for the table in the selected unit."""
+        if temp_c is None or np.isnan(temp_c):
+            return "N/A"
+        if self.temp_unit == 'F':
+            temp_c = temp_c * 1.8 + 32
+        return f"{temp_c:.2f}"
+
+    def _fmt_time(self, t):
+        """Formats t as HH:MM:SS, reusing the previous result within the same second."""
+        ti = int(t)
+        if ti != self._last_strftime_t:
+            self._last_strftime_s = time.strftime("%H:%M:%S", time.localtime(ti))
+            self._last_strftime_t = ti
+        return self._last_strftime_s
+
+    def _update_treeview_display(self, sensors=None):
+        """Refreshes the rows of the given sensors (all known sensors by default)."""
+        if sensors is None:
+            sensors = self.latest
+        for sensor in self._sensor_order:
+            if sensor not in sensors:
+                continue
+            t, temp_c = self.latest[sensor]
+            timestr = self._fmt_time(t)
+            temp_display = self._format_temp(temp_c)
+            # Rows are stable; only their cells change
+            row_id = self.tree_row_ids.get(sensor)
+            if row_id is None:
+                self.tree_row_ids[sensor] = self.tree.insert("", "end", values=(sensor, temp_display, timestr))
             else:
-                temp_display = f"{(temp_c * 9/5) + 32:.2f}" if self.temp_unit == 'F' else f"{temp_c:.2f}"
-                self.tree.heading("temp", text="Temp (°F)" if self.temp_unit == 'F' else "Temp (°C)")
-            self.tree.insert("", "end", values=(sensor, temp_display, timestr))
+                self.tree.item(row_id, values=(sensor, temp_display, timestr))
 
     def _toggle_sensor(self, sensor_id):
         current_state = self.sensor_states.get(sensor_id, 'off')
@@ -340,15 +634,9 @@ class TempMonitorClientApp:
         self._send_command(command)
 
     def _send_command(self, command_data):
-        # Placeholder for sending commands. Actual implementation requires HTTP POST.
-        # This will need to be integrated with the HTTPPollerThread or a separate sender.
-        command_str = json.dumps(command_data) + '\n'
-        self.notify(f"Command to send: {command_str.strip()}")
-        # In a real implementation, this would send command_str over HTTP.
-        # For now, we'll just update the status.
-        # The actual sending mechanism needs to be implemented.
-        # This is a complex part and might require refactoring HTTPPollerThread.
-        # For now, we'll just print the command and update the status bar.
+        # Placeholder: the device firmware only serves / and /temp, so there is no endpoint to
+        # send commands to yet. Once it defines one, send it from HTTPPollerThread's session.
+        self.notify(f"Command to send: {json.dumps(command_data)}")
 
     def _save_all_settings(self):
         try:
@@ -378,9 +666,11 @@ class TempMonitorClientApp:
                     self.notify("Warning: Email alerts are enabled but sender email, password, or recipient is missing. Please check alert settings.")
             else:
                 self.notify("Alert settings cleared.")
-            
-            # Restart poller thread with updated thresholds
-            self._start_poller_thread()
+
+            # Thresholds are evaluated on this thread (_check_alerts), so the poller and its
+            # keep-alive connection are left running; only the alert episodes start over.
+            self._alert_active.clear()
+            self._run_start.clear()
 
         except ValueError:
             self.notify("Invalid input for temperature thresholds. Please enter numbers.")
@@ -393,111 +683,168 @@ class TempMonitorClientApp:
         """Updates the status bar with a message."""
         self.status_var.set(msg)
 
+    def _check_alerts(self, sensor):
+        """Runs the alert state machine over the samples that arrived since the last check."""
+        ring = self.series[sensor]
+        n_new = ring.idx - self._alert_checked[sensor]
+        self._alert_checked[sensor] = ring.idx
+        if n_new <= 0:
+            return
+        ts, ys = ring.last(n_new)
+        for direction, threshold, alert_type in (("max", self.max_temp_threshold, "above max threshold"),
+                                                 ("min", self.min_temp_threshold, "below min threshold")):
+            if threshold is None:
+                continue
+            key = (sensor, direction)
+            active = self._alert_active[key]
+            # A run still open at the previous check continues from its recorded start
+            run_start = self._run_start.get(key)
+            # After each transition the rest of the batch is re-evaluated under the new condition,
+            # so a batch holding a whole episode (trigger and clear) ends in the right state
+            pos = 0
+            while pos < len(ys):
+                seg_ts, seg_ys = ts[pos:], ys[pos:]
+                if direction == "max":
+                    cond = seg_ys < threshold - self.hysteresis_band if active else seg_ys > threshold
+                else:
+                    cond = seg_ys > threshold + self.hysteresis_band if active else seg_ys < threshold
+                starts = _run_starts(seg_ts, cond, run_start)
+                hits = np.flatnonzero(seg_ts - starts >= self.persist_seconds)
+                if not hits.size:
+                    run_start = starts[-1] if cond[-1] else None
+                    break
+                flip = pos + hits[0]
+                if not active:
+                    self._trigger_alert_from_reader(sensor, float(ys[flip]), alert_type)
+                active = not active
+                # The opposite condition starts its own run after the transition
+                run_start = None
+                pos = flip + 1
+            self._alert_active[key] = active
+            self._run_start[key] = run_start
+
     def _trigger_alert_from_reader(self, sensor, temp_c, alert_type):
-        """Callback from HTTPPollerThread to trigger an alert in the main app."""
-        current_time = time.time()
-        if current_time - self.last_alert_time >= 60: # 60-second cooldown
-            self.last_alert_time = current_time
-            self._send_alert_email(sensor, temp_c, alert_type)
-            self.notify(f"UI Alert: {sensor} {alert_type} at {temp_c:.2f}°C. Email sent.")
-        else:
-            self.notify(f"UI Alert: {sensor} {alert_type} at {temp_c:.2f}°C. Email suppressed (cooldown).")
+        """Triggers an alert in the main app."""
+        # Called once per sustained episode (see _check_alerts), so no cooldown is needed
+        self._send_alert_email(sensor, temp_c, alert_type)
+        self.notify(f"UI Alert: {sensor} {alert_type} at {temp_c:.2f}°C. Email queued.")
 
     def _send_alert_email(self, sensor, temp_c, alert_type):
-        """Sends an email alert."""
+        """Queues an email alert for AlertSenderThread."""
         message_body = f"ALERT: Sensor {sensor} is {alert_type} at {temp_c:.2f}°C."
         subject = f"Temperature Alert: {sensor} {alert_type.split(' ')[-1]}"
 
         if self.recipient:
             if self.sender_email and self.sender_password:
                 try:
-                    email_handler = EmailHandler()
-                    if email_handler.send_email(self.sender_email, self.sender_password, self.recipient, subject, message_body):
-                        self.notify(f"Alert email sent to {self.recipient}.")
-                    else:
-                        self.notify(f"Failed to send alert email to {self.recipient}.")
-                except Exception as e:
-                    self.notify(f"Error during alert email sending: {e}")
+                    # Credentials are captured now so the sender thread never reads UI state
+                    self._alert_queue.put_nowait((self.sender_email, self.sender_password, self.recipient,
+                                                  subject, message_body))
+                except queue.Full:
+                    self.notify("Alert email queue is full. Alert email dropped.")
             else:
                 self.notify("Sender email or password not provided. Cannot send alert email.")
         else:
             self.notify(f"{message_body} (No recipient set).")
 
-    def _drain_status(self):
+    def _drain_status(self, event=None):
         try:
-            while True:
-                msg = self.status_queue.get_nowait()
+            while self.status_queue:
+                msg = self.status_queue.popleft()
                 if isinstance(msg, dict) and msg.get("type") == "disconnected":
                     timestamp = msg.get("timestamp", time.time())
-                    for sensor in list(self.series.keys()):
-                        self.series[sensor].append((timestamp, float('nan')))
-                    self._redraw_plot()
-                    self.status_var.set(f"Disconnected at {time.strftime('%H:%M:%S', time.localtime(timestamp))}. Reconnecting...")
+                    for ring in self.series.values():
+                        ring.append(timestamp, np.nan)
+                    self._schedule_redraw()
+                    self.status_var.set(f"Disconnected at {self._fmt_time(timestamp)}. Reconnecting...")
                 else:
                     self.status_var.set(msg)
-        except queue.Empty:
-            pass
         finally:
-            self.root.after(250, self._drain_status)
-
-    def _drain_data(self):
-        try:
-            updated_sensors = set()
-            while True:
-                obj = self.data_queue.get_nowait()
-                t = obj.get("ts", time.time())
-                sensor = str(obj.get("sensor", "S1"))
-                temp = float(obj["t_c"])
+            if event is None:
+                self.root.after(self.drain_fallback_ms, self._drain_status)
+
+    def _drain_data(self, event=None):
+        updated_sensors = set()
+        while self.data_queue:
+            # Each item is one poll's batch of (ts, sensor, t_c) tuples
+            for t, sensor, temp in self.data_queue.popleft():
                 self.latest[sensor] = (t, temp)
-                dq = self.series[sensor]
-                dq.append((t, temp))
+                ring = self.series.get(sensor)
+                if ring is None:
+                    ring = self.series[sensor] = _RingArray(self.series_capacity)
+                    bisect.insort(self._sensor_order, sensor)
+                ring.append(t, temp)
                 updated_sensors.add(sensor)
-        except queue.Empty:
-            pass
 
-        self._update_treeview_display()
+        for sensor in updated_sensors:
+            self._check_alerts(sensor)
+
+        # The time column has 1 s resolution, so refresh the readings table at most once a second
+        self._tree_dirty |= updated_sensors
+        now = time.time()
+        if self._tree_dirty and now - self._last_tree_draw >= 1.0:
+            self._update_treeview_display(self._tree_dirty)
+            self._tree_dirty = set()
+            self._last_tree_draw = now
+        if updated_sensors:
+            self._schedule_redraw()
+        if event is None:
+            self.root.after(self.drain_fallback_ms, self._drain_data)
+
+    def _schedule_redraw(self):
+        # Coalesce redraw requests into a single repaint, no sooner than min_frame_interval after the last one
+        if self._redraw_pending:
+            return
+        self._redraw_pending = True
+        delay = self._last_redraw + self.min_frame_interval - time.monotonic()
+        if delay > 0:
+            self.root.after(int(delay * 1000) + 1, self._do_redraw)
+        else:
+            self.root.after_idle(self._do_redraw)
+
+    def _do_redraw(self):
+        self._redraw_pending = False
         self._redraw_plot()
-        self.root.after(int(self.interval * 1000), self._drain_data)
+        self._last_redraw = time.monotonic()
 
-    def _redraw_plot(self):
+    def _apply_unit_axes(self):
+        # Fixed limits: blitted lines never trigger autoscaling, so the background stays valid
+        self.ax.set_ylim(*self.plot_limits[self.temp_unit])
+        self.ax.set_ylabel(f"Temperature (°{self.temp_unit})")
+
+    def _on_canvas_draw(self, event):
+        self._bg = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def _update_lines(self):
         now = time.time()
         tmin = now - self.history_seconds
-        self.ax.clear()
-        self.ax.set_xlabel("Time (s, recent)")
-        if self.temp_unit == 'F':
-            y_min, y_max = 50, 122
-            self.ax.set_ylabel("Temperature (°F)")
-        else:
-            y_min, y_max = 10, 50
-            self.ax.set_ylabel("Temperature (°C)")
-        self.ax.set_ylim(y_min, y_max)
-        self.ax.grid(True, which="both", linestyle="--", alpha=0.4)
+        convert = _c_to_f if self.temp_unit == 'F' else _identity
+
+        for sensor in self._sensor_order:
+            ts, t_c = self.series[sensor].window(tmin)
+            xs = ts - now
+            ys = convert(t_c)
+            # NaN samples (disconnects) break the line, so no manual segmenting is needed
+            line = self.lines.get(sensor)
+            if line is None:
+                # Unknown sensor: the legend changes, so the background must be redrawn
+                line, = self.ax.plot([], [], label=sensor, animated=True)
+                self.lines[sensor] = line
+                self.ax.legend(loc="upper left")
+                self._bg = None
+            line.set_data(xs, ys)
 
-        for sensor, dq in sorted(self.series.items()):
-            xs, ys = [], []
-            for (t, y) in dq:
-                if t >= tmin:
-                    xs.append(t - now)
-                    ys.append(y if y is not None else math.nan)
-            if xs:
-                if self.temp_unit == 'F':
-                    ys_conv = [(y * 9/5) + 32 if y is not None and not math.isnan(y) else math.nan for y in ys]
-                else:
-                    ys_conv = [y if y is not None and not math.isnan(y) else math.nan for y in ys]
-                segx, segy = [], []
-                for i in range(len(xs)):
-                    if not math.isnan(ys_conv[i]):
-                        segx.append(xs[i])
-                        segy.append(ys_conv[i])
-                    else:
-                        if segx:
-                            self.ax.plot(segx, segy, label=sensor)
-                            segx, segy = [], []
-                if segx:
-                    self.ax.plot(segx, segy, label=sensor)
-        if self.series:
-            self.ax.legend(loc="upper left")
-        self.canvas.draw_idle()
+    def _redraw_plot(self):
+        self._update_lines()
+        if self._bg is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._bg)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
 
 
 def main():
@@ -17,34 +17,72 @@ Notes:
 - Multiple clients can connect; each gets its own stream.
 """
 import argparse
-import json
+import gc
 import math
+import os
+import queue
 import random
+import socket
+import sys
 import threading
 import time
 from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 from urllib.parse import urlparse, parse_qs
 
 
+def _format_temp(temp_c):
+    """Formats a reading to 2 decimals like the firmware's String(x, 2), or JSON null."""
+    return "null" if temp_c is None else "%.2f" % temp_c
+
+
+def _encode_temp_body(c1, c2, ts):
+    """Fills the fixed /temp shape {"c1":..,"c2":..,"ts":..} from preformatted readings."""
+    return f'{{"c1":{c1},"c2":{c2},"ts":{ts!r}}}'.encode("ascii")
+
+
+# Complete HTTP/1.1 responses, written with a single wfile.write each (status line, headers and
+# body in one send). No Connection header: keep-alive is the HTTP/1.1 default.
+def _build_temp_response(etag, body):
+    return (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nETag: " + etag.encode("ascii")
+            + b"\r\nContent-Length: " + str(len(body)).encode("ascii") + b"\r\n\r\n" + body)
+
+
+def _build_not_modified_response(etag):
+    return b"HTTP/1.1 304 Not Modified\r\nETag: " + etag.encode("ascii") + b"\r\n\r\n"
+
+
+_NOT_FOUND_RESPONSE = b"HTTP/1.1 404 Not Found\r\nContent-Length: 9\r\n\r\nNot Found"
+
+
+# Half a sine period (0..pi) sampled once; the S1 bump indexes it by progress
+_SIN_TABLE_SIZE = 1024
+_SIN_TABLE = [math.sin(math.pi * k / (_SIN_TABLE_SIZE - 1)) for k in range(_SIN_TABLE_SIZE)]
+
+
 class TempData:
     def __init__(self, sensors, base, jitter):
+        # The step in get_temps is written out for exactly these two sensors
+        if list(sensors) != ["S1", "S2"]:
+            raise ValueError(f"TempData simulates sensors S1 and S2, got {sensors!r}")
         self.sensors = sensors
-        self.base_c = {"S1": 22.0, "S2": 21.7}  # S1 at 22°C, S2 at 21.7°C
-        self.drift_c = {s: 0.0 for s in sensors}
+        # Per-sensor state as parallel lists, index 0 = S1, 1 = S2 (no per-tick dict lookups)
+        self.base_c = [22.0, 21.7]  # S1 at 22°C, S2 at 21.7°C
+        self.drift_c = [0.0, 0.0]
         self.jitter = jitter
-        self._lock = threading.Lock()
-        self.current_temp = {s: self.base_c[s] for s in sensors} # Actual temperature reported by the sensor
-        self.last_update_time = time.time()
+        self.current_temp = list(self.base_c) # Actual temperature reported by the sensor
+        # Bump timers use the monotonic clock so wall-clock jumps cannot stretch or skip a bump
+        self.last_update_time = time.monotonic()
 
         # For S1 bump
-        self.s1_last_bump_time = time.time()
+        self.s1_last_bump_time = time.monotonic()
         self.s1_bump_target_temp = 0.0
         self.s1_bump_start_time = 0.0
         self.s1_bump_duration = 300.0  # Increased duration for slower change (5 minutes)
         self.s1_bump_active = False
 
         # For S2 bump
-        self.s2_last_bump_trigger_time = time.time()
+        self.s2_last_bump_trigger_time = time.monotonic()
         self.s2_bump_target_temp = 26.0
         self.s2_bump_start_time = 0.0
         self.s2_bump_rise_duration = 15.0 # 15 seconds to rise
@@ -54,108 +92,205 @@ class TempData:
         self.smoothing_factor = 0.001 # Controls how quickly the sensor temp approaches the target (divided by 10)
 
     def get_temps(self):
-        with self._lock:
-            now = time.time()
-            delta_time = now - self.last_update_time
-            self.last_update_time = now
-            temps = {}
-
-            # Check for S1 bump trigger
-            if now - self.s1_last_bump_time >= 60.0 and not self.s1_bump_active: # Every minute
-                self.s1_last_bump_time = now
-                self.s1_bump_start_time = now
-                self.s1_bump_target_temp = random.uniform(24.0, 26.0)
-                self.s1_bump_active = True
-
-            # Check for S2 bump trigger
-            if now - self.s2_last_bump_trigger_time >= 60.0 and not self.s2_bump_active: # Every minute
-                self.s2_last_bump_trigger_time = now
-                self.s2_bump_start_time = now
-                self.s2_bump_active = True
-
-            for sname in self.sensors:
-                base_temp = self.base_c[sname]
-                current_drift = self.drift_c[sname]
-
-                # Apply random walk for general stability
-                current_drift += random.uniform(-self.jitter, self.jitter)
-                current_drift = max(-0.5, min(0.5, current_drift)) # Keep drift small for stability
-                self.drift_c[sname] = current_drift
-
-                target_temp = base_temp + current_drift
-
-                # Apply S1 bump if active
-                if sname == "S1" and self.s1_bump_active:
-                    elapsed_time = now - self.s1_bump_start_time
-                    if elapsed_time < self.s1_bump_duration:
-                        # Calculate bump value using a sine wave for gradual rise and fall
-                        progress = elapsed_time / self.s1_bump_duration
-                        # Use a sine wave from 0 to pi to get a smooth curve from 0 up to 1 and back to 0
-                        bump_factor = math.sin(progress * math.pi)
-                        target_temp += (self.s1_bump_target_temp - base_temp) * bump_factor
-                    else:
-                        self.s1_bump_active = False # End the bump after duration
-
-                # Apply S2 bump if active
-                if sname == "S2" and self.s2_bump_active:
-                    elapsed_time = now - self.s2_bump_start_time
-                    total_s2_bump_duration = self.s2_bump_rise_duration + self.s2_bump_fall_duration
-                    if elapsed_time < total_s2_bump_duration:
-                        if elapsed_time < self.s2_bump_rise_duration:
-                            # Rising phase
-                            progress = elapsed_time / self.s2_bump_rise_duration
-                            bump_value = (self.s2_bump_target_temp - base_temp) * progress
-                        else:
-                            # Falling phase
-                            progress = (elapsed_time - self.s2_bump_rise_duration) / self.s2_bump_fall_duration
-                            bump_value = (self.s2_bump_target_temp - base_temp) * (1 - progress)
-                        target_temp += bump_value
-                    else:
-                        self.s2_bump_active = False # End the bump after duration
-
-                # Slowly move current_temp towards target_temp
-                self.current_temp[sname] += (target_temp - self.current_temp[sname]) * self.smoothing_factor * delta_time
-                temps[sname] = round(self.current_temp[sname], 2)
-            return temps
+        """Advances the simulation to now; only called from the server's ticker thread."""
+        now = time.monotonic()
+        delta_time = now - self.last_update_time
+        self.last_update_time = now
+
+        # Check for S1 bump trigger
+        if now - self.s1_last_bump_time >= 60.0 and not self.s1_bump_active: # Every minute
+            self.s1_last_bump_time = now
+            self.s1_bump_start_time = now
+            self.s1_bump_target_temp = random.uniform(24.0, 26.0)
+            self.s1_bump_active = True
+
+        # Check for S2 bump trigger
+        if now - self.s2_last_bump_trigger_time >= 60.0 and not self.s2_bump_active: # Every minute
+            self.s2_last_bump_trigger_time = now
+            self.s2_bump_start_time = now
+            self.s2_bump_active = True
+
+        # Straight-line step for S1 and S2: no per-sensor loop or name checks
+        base_c, drift_c, current_temp = self.base_c, self.drift_c, self.current_temp
+        jitter = self.jitter
+        step = self.smoothing_factor * delta_time
+
+        # S1 bump: half a sine wave over s1_bump_duration
+        s1_bump = 0.0
+        if self.s1_bump_active:
+            elapsed_time = now - self.s1_bump_start_time
+            if elapsed_time < self.s1_bump_duration:
+                progress = elapsed_time / self.s1_bump_duration
+                # Use a sine wave from 0 to pi to get a smooth curve from 0 up to 1 and back to 0
+                bump_factor = _SIN_TABLE[int(progress * (_SIN_TABLE_SIZE - 1) + 0.5)]
+                s1_bump = (self.s1_bump_target_temp - base_c[0]) * bump_factor
+            else:
+                self.s1_bump_active = False # End the bump after duration
+
+        # S2 bump: linear rise then linear fall
+        s2_bump = 0.0
+        if self.s2_bump_active:
+            elapsed_time = now - self.s2_bump_start_time
+            if elapsed_time < self.s2_bump_rise_duration + self.s2_bump_fall_duration:
+                bump_height = self.s2_bump_target_temp - base_c[1]
+                if elapsed_time < self.s2_bump_rise_duration:
+                    # Rising phase
+                    s2_bump = bump_height * (elapsed_time / self.s2_bump_rise_duration)
+                else:
+                    # Falling phase
+                    progress = (elapsed_time - self.s2_bump_rise_duration) / self.s2_bump_fall_duration
+                    s2_bump = bump_height * (1 - progress)
+            else:
+                self.s2_bump_active = False # End the bump after duration
+
+        # Apply random walk for general stability, kept small (±0.5 °C)
+        s1_drift = max(-0.5, min(0.5, drift_c[0] + random.uniform(-jitter, jitter)))
+        s2_drift = max(-0.5, min(0.5, drift_c[1] + random.uniform(-jitter, jitter)))
+        drift_c[0] = s1_drift
+        drift_c[1] = s2_drift
+
+        # Slowly move each current temperature towards its target
+        s1 = current_temp[0]
+        s1 += (base_c[0] + s1_drift + s1_bump - s1) * step
+        s2 = current_temp[1]
+        s2 += (base_c[1] + s2_drift + s2_bump - s2) * step
+        current_temp[0] = s1
+        current_temp[1] = s2
+        return {"S1": s1, "S2": s2}
 
 
 class HTTPRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive so a polling client reuses one connection; every response must therefore
+    # carry a Content-Length (or have no body, like 304)
+    protocol_version = "HTTP/1.1"
+    # Responses are a single small write; send it now instead of letting Nagle hold it for an ACK
+    disable_nagle_algorithm = True
+
     def do_GET(self):
         parsed_path = urlparse(self.path)
         if parsed_path.path == "/temp":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-
-            temps = self.server.temp_data.get_temps()
-            response_data = {
-                "c1": temps.get("S1"),
-                "c2": temps.get("S2"),
-                "ts": time.time()
-            }
-            self.wfile.write(json.dumps(response_data).encode("utf-8"))
+            # Long poll: hold the request up to ?wait=<ms> until the reading differs
+            # from the client's If-None-Match ETag, then answer 200 (or 304 on timeout).
+            query = parse_qs(parsed_path.query)
+            try:
+                wait_s = max(0.0, float(query.get("wait", ["0"])[0]) / 1000.0)
+            except ValueError:
+                wait_s = 0.0
+            client_etag = self.headers.get("If-None-Match")
+
+            # Lock-free read of the ticker's latest published reading; only a client that
+            # already has it blocks, woken by the ticker when the reading changes
+            etag, response = self.server.snapshot
+            if etag == client_etag and wait_s > 0:
+                etag, response = self.server.wait_for_change(client_etag, wait_s)
+
+            if etag == client_etag:
+                self.wfile.write(_build_not_modified_response(etag))
+            else:
+                self.wfile.write(response)
         else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b"Not Found")
+            self.wfile.write(_NOT_FOUND_RESPONSE)
 
     def log_message(self, format, *args):
         # Suppress default logging to avoid clutter, or customize if needed
         pass
 
 
-class ThreadedHTTPServer(HTTPServer):
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
     allow_reuse_address = True
+    # listen() backlog (socketserver defaults to 5); the kernel clamps it to its own limit
+    request_queue_size = socket.SOMAXCONN
 
-    def __init__(self, server_address, RequestHandlerClass, temp_data):
+    def __init__(self, server_address, RequestHandlerClass, temp_data, tick_interval=0.1, reuse_port=False):
+        # Must be set before the base constructor binds the socket
+        self._reuse_port = reuse_port
         super().__init__(server_address, RequestHandlerClass)
         self.temp_data = temp_data
-        self._log_lock = threading.Lock()
+        self.tick_interval = tick_interval
+        # Log lines are queued and written by one thread, so callers never wait on stdout
+        self._log_q = queue.SimpleQueue()
+        self._log_thread = threading.Thread(target=self._log_drain, daemon=True)
+        self._log_thread.start()
+        # One ticker thread advances the simulation and publishes (etag, full /temp response);
+        # handlers only read self.snapshot, and a single attribute rebind needs no lock.
+        # Long-polling handlers wait on _snapshot_changed, notified when the ETag changes.
+        self.snapshot = (None, b"")
+        self.snapshot = self._take_snapshot()
+        self._snapshot_changed = threading.Condition()
+        self._ticker_stop = threading.Event()
+        self._ticker = threading.Thread(target=self._tick_loop, daemon=True)
+        self._ticker.start()
+
+    def server_bind(self):
+        # Set SO_REUSEPORT here rather than via allow_reuse_port, which socketserver only honours on 3.11+
+        if self._reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def _take_snapshot(self):
+        temps = self.temp_data.get_temps()
+        # Each reading is formatted once and reused for both the ETag and the body
+        c1 = _format_temp(temps.get("S1"))
+        c2 = _format_temp(temps.get("S2"))
+        etag = f'"{c1}-{c2}"'
+        if etag == self.snapshot[0]:
+            # Rounded reading unchanged: keep the response (and its ts) from when it first appeared
+            return self.snapshot
+        return etag, _build_temp_response(etag, _encode_temp_body(c1, c2, time.time()))
+
+    def _tick_loop(self):
+        while not self._ticker_stop.wait(self.tick_interval):
+            snapshot = self._take_snapshot()
+            if snapshot is not self.snapshot:
+                with self._snapshot_changed:
+                    self.snapshot = snapshot
+                    self._snapshot_changed.notify_all()
+
+    def wait_for_change(self, etag, timeout):
+        """Blocks until the published ETag differs from etag or timeout elapses; returns the snapshot."""
+        with self._snapshot_changed:
+            self._snapshot_changed.wait_for(lambda: self.snapshot[0] != etag, timeout)
+            return self.snapshot
+
+    def server_close(self):
+        self._ticker_stop.set()
+        super().server_close()
+        # Flush pending log lines before the process exits
+        self._log_q.put(None)
+        self._log_thread.join(timeout=1.0)
 
     def log(self, msg):
-        with self._log_lock:
-            print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+        self._log_q.put(f"[{time.strftime('%H:%M:%S')}] {msg}\n")
+
+    def _log_drain(self):
+        while True:
+            line = self._log_q.get()
+            # Batch whatever else is already queued into the same write
+            lines = []
+            while line is not None:
+                lines.append(line)
+                if self._log_q.empty():
+                    break
+                line = self._log_q.get()
+            if lines:
+                sys.stdout.write("".join(lines))
+                sys.stdout.flush()
+            if line is None:
+                break
+
+
+def _fork_workers(count):
+    """Forks count - 1 extra server processes; returns the child pids in the parent, None in a child."""
+    children = []
+    for _ in range(count - 1):
+        pid = os.fork()
+        if pid == 0:
+            # Diverge from the parent's random stream so each worker simulates its own bumps
+            random.seed(os.getpid())
+            return None
+        children.append(pid)
+    return children
 
 
 def main():
@@ -164,19 +299,39 @@ def main():
     parser.add_argument("--port", type=int, default=80, help="Port to listen on (default: 80)")
     # Removed --base argument as it's now fixed in TempData
     parser.add_argument("--jitter", type=float, default=0.01, help="Random-walk step size (default: 0.01 °C)") # Increased jitter slightly
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes sharing the port via SO_REUSEPORT, for load testing; "
+                             "each simulates its own readings (default: 1)")
     args = parser.parse_args()
 
+    children = []
+    if args.workers > 1:
+        if not (hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")):
+            parser.error("--workers > 1 needs os.fork and SO_REUSEPORT (Linux/macOS)")
+        # Fork before any server or ticker thread exists; the kernel then spreads accepts across workers
+        children = _fork_workers(args.workers)
+
     # main.py expects S1 and S2
     temp_data = TempData(sensors=["S1", "S2"], base=22.0, jitter=args.jitter) # Base is now fixed in TempData
 
-    server = ThreadedHTTPServer((args.host, args.port), HTTPRequestHandler, temp_data)
-    server.log(f"Serving fake temps on http://{args.host}:{args.port}/temp")
+    server = ThreadedHTTPServer((args.host, args.port), HTTPRequestHandler, temp_data,
+                                reuse_port=args.workers > 1)
+    if children is not None:
+        server.log(f"Serving fake temps on http://{args.host}:{args.port}/temp ({args.workers} worker(s))")
+    # Startup objects (modules, the sine table, server and simulation state) live for the whole
+    # run: move them out of the collector's view so collections only walk per-request garbage
+    gc.collect()
+    gc.freeze()
     try:
         server.serve_forever()
     except KeyboardInterrupt:
-        server.log("Shutting down...")
+        if children is not None:
+            server.log("Shutting down...")
         server.shutdown()
         server.server_close()
+    # Ctrl+C reaches the whole process group; wait for the workers to exit too
+    for pid in children or ():
+        os.waitpid(pid, 0)
 
 
 if __name__ == "__main__":